@@ -1,4 +1,4 @@
-from flask import render_template, request, jsonify, send_file, redirect, url_for
+from flask import render_template, request, jsonify, send_file, redirect, url_for, Response, stream_with_context
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -13,6 +13,7 @@ from openpyxl.chart.series import Series
 import tempfile
 import json
 from collections import defaultdict
+from dataclasses import replace
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,16 +23,26 @@ APP_PASSWORD = os.environ.get("APP_PASSWORD")
 
 from utils import (
     AdvancedRefineryCrudeScheduler,
+    ResultCache,
+    SimulationConfig,
+    VESSEL_CLASSES,
     get_date_with_ordinal,
     _parse_json_datetime,
     _save_excel_with_conflict_handling,
     _calculate_timestamp_consumption_summary,
-    populate_tank_times
+    populate_tank_times,
+    ensure_row_format
 )
 
 # Global scheduler instance
 scheduler = AdvancedRefineryCrudeScheduler()
 
+# Serialized /api/simulate responses by normalized params
+result_cache = ResultCache()
+
+# Result lists /api/simulate/stream sends day by day instead of in its summary
+STREAMED_RESULTS = ('simulation_data', 'feeding_events_log', 'filling_events_log', 'daily_discharge_log')
+
 # Save/Load user inputs configuration
 INPUTS_FILE = "last_inputs.json"
 
@@ -63,10 +74,111 @@ def register_routes(app):
 
     @app.route('/api/simulate', methods=['POST'])
     def simulate():
+        """Run a simulation, answering repeats of the same normalized params from result_cache"""
+        params = request.json
+        try:
+            config = SimulationConfig.from_params(params)
+        except ValueError:
+            return jsonify(scheduler.run_simulation(params))
+
+        # The start falls back to today when no date is given, so it is part of the key
+        key = (config.fingerprint(), scheduler._get_processing_start_datetime(config))
+        body = result_cache.get(key)
+        if body is None:
+            results = scheduler.run_simulation(config)
+            response = jsonify(results)
+            if 'error' not in results:
+                result_cache.put(key, response.get_data())
+            return response
+        return app.response_class(body, mimetype='application/json')
+
+    @app.route('/api/simulate/cache', methods=['GET'])
+    def simulate_cache_stats():
+        """Size, bounds and hit/miss counters of the /api/simulate result cache"""
+        return jsonify(result_cache.stats())
+
+    @app.route('/api/simulate/stream', methods=['POST'])
+    def simulate_stream():
+        """Newline-delimited JSON: one record per day as it is simulated, then the summary
+
+        The summary carries the alerts as /api/simulate returns them (aggregated unless
+        aggregateAlerts is false) but not the day rows and event logs already streamed. A run
+        found in result_cache is sent as a single summary record holding the full results.
+        """
         params = request.json
-        results = scheduler.run_simulation(params)
+
+        def generate():
+            try:
+                config = SimulationConfig.from_params(params)
+            except ValueError as e:
+                yield app.json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+                return
+
+            key = (config.fingerprint(), scheduler._get_processing_start_datetime(config))
+            body = result_cache.get(key)
+            if body is not None:
+                yield app.json.dumps({'type': 'summary', **json.loads(body)}) + '\n'
+                return
+
+            for record in scheduler.iter_simulation(config):
+                if record['type'] == 'day':
+                    record['progress'] = record['day']['day_index'] / config.scheduling_window
+                elif record['type'] == 'summary':
+                    results = {name: value for name, value in record.items() if name != 'type'}
+                    result_cache.put(key, jsonify(results).get_data())
+                    record = {name: value for name, value in record.items() if name not in STREAMED_RESULTS}
+                yield app.json.dumps(record) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @app.route('/api/simulate/long', methods=['POST'])
+    def simulate_long():
+        """Multi-year run: summary plus a run_id whose days are read back page by page"""
+        try:
+            return jsonify(scheduler.run_spilled(request.json))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/api/runs/<run_id>/days', methods=['GET'])
+    def spilled_run_days(run_id):
+        try:
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args.get('limit', 30))
+        except ValueError:
+            return jsonify({'error': 'offset and limit must be integers'}), 400
+        try:
+            page = scheduler.spilled_page(run_id, offset, limit)
+        except KeyError as e:
+            return jsonify({'error': e.args[0]}), 404
+        return jsonify(page)
+
+    @app.route('/api/runs/<run_id>', methods=['DELETE'])
+    def release_spilled_run(run_id):
+        scheduler.release_spilled_run(run_id)
+        return jsonify({'released': run_id})
+
+    @app.route('/api/simulate/resume', methods=['POST'])
+    def simulate_resume():
+        """Re-run edited inputs from the last checkpoint they leave unchanged"""
+        results = scheduler.resume_simulation(request.json)
         return jsonify(results)
 
+    @app.route('/api/disruption_study', methods=['POST'])
+    def disruption_study():
+        """Metrics for each of params['disruptionWindows'] from one shared undisrupted prefix"""
+        try:
+            return jsonify(scheduler.study_disruptions(request.json))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/api/forecast', methods=['POST'])
+    def forecast():
+        """Fast aggregate inventory projection for previews, without the tank engine"""
+        try:
+            return jsonify(scheduler.forecast_inventory(request.json))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
     # THE CORRECTED VERSION
     def _create_sequence_summary_sheets(wb, results):
         """Create ONE sheet with all 3 sequence tables"""
@@ -1618,7 +1730,7 @@ def register_routes(app):
     def export_tank_status():
         """Export sequence report with both Sequence Summary and Tank Filling Volumes sheets"""
         try:
-            results = request.json
+            results = ensure_row_format(request.json)
             
             # Create a new workbook
             wb = Workbook()
@@ -1685,7 +1797,7 @@ def register_routes(app):
     def export_charts():
         """Export comprehensive charts workbook with 9 sheets including embedded charts and cargo timeline"""
         try:
-            results = request.json
+            results = ensure_row_format(request.json)
             
             # Create workbook with timestamp in workbook name
             wb = Workbook()
@@ -1821,33 +1933,19 @@ def register_routes(app):
     @app.route('/api/cargo_optimization', methods=['POST'])
     def cargo_optimization():
         try:
-            params = request.json
+            config = SimulationConfig.from_params(request.json)
             
-            cargo_types = []
-            if params.get('vlccCapacity', 0) > 0:
-                cargo_types.append({'name': 'vlcc', 'size': float(params.get('vlccCapacity'))})
-            if params.get('suezmaxCapacity', 0) > 0:
-                cargo_types.append({'name': 'suezmax', 'size': float(params.get('suezmaxCapacity'))})
-            if params.get('aframaxCapacity', 0) > 0:
-                cargo_types.append({'name': 'aframax', 'size': float(params.get('aframaxCapacity'))})
-            if params.get('panamaxCapacity', 0) > 0:
-                cargo_types.append({'name': 'panamax', 'size': float(params.get('panamaxCapacity'))})
-            if params.get('handymaxCapacity', 0) > 0:
-                cargo_types.append({'name': 'handymax', 'size': float(params.get('handymaxCapacity'))})
+            cargo_types = [{'name': name, 'size': size} for name, size in config.vessel_capacities.items() if size > 0]
             
             optimization_results = {}
             combo_counter = 1
             
             # Test single cargo types
             for cargo in cargo_types:
-                test_params = params.copy()
-                
                 # Disable all other cargo types
-                for other_cargo in ['vlcc', 'suezmax', 'aframax', 'panamax', 'handymax']:
-                    if other_cargo != cargo['name']:
-                        test_params[f'{other_cargo}Capacity'] = 0
+                test_config = replace(config, **{f'{other_cargo}_capacity': 0 for other_cargo in VESSEL_CLASSES if other_cargo != cargo['name']})
                 
-                results = scheduler.run_simulation(test_params)
+                results = scheduler.run_simulation(test_config, render_alerts=False)
                 
                 if 'error' not in results:
                     metrics = results.get('metrics', {})
@@ -1870,12 +1968,10 @@ def register_routes(app):
                         cargo1 = cargo_types[i]
                         cargo2 = cargo_types[j]
                         
-                        test_params = params.copy()
-                        for cargo_name in ['vlcc', 'suezmax', 'aframax', 'panamax', 'handymax']:
-                            if cargo_name not in [cargo1['name'], cargo2['name']]:
-                                test_params[f'{cargo_name}Capacity'] = 0
+                        test_config = replace(config, **{f'{cargo_name}_capacity': 0 for cargo_name in VESSEL_CLASSES
+                                                         if cargo_name not in [cargo1['name'], cargo2['name']]})
                         
-                        results = scheduler.run_simulation(test_params)
+                        results = scheduler.run_simulation(test_config, render_alerts=False)
                         
                         if 'error' not in results:
                             metrics = results.get('metrics', {})
@@ -27,6 +27,8 @@ const TANK_STATUS_COLORS = {
 // FIXED: Added missing EXPORT_CHARTS endpoint
 const API_ENDPOINTS = {
     SIMULATE: '/api/simulate',
+    SIMULATE_STREAM: '/api/simulate/stream',
+    FORECAST: '/api/forecast',
     BUFFER_ANALYSIS: '/api/buffer_analysis',
     CARGO_OPTIMIZATION: '/api/cargo_optimization',
     SAVE_INPUTS: '/api/save_inputs',
@@ -74,6 +76,28 @@ const Utils = {
     `
 };
 
+/**
+ * Rebuild per-day simulation_data rows from the columnar result format
+ * (mirror of columnar_to_rows in utils.py)
+ */
+function columnarToRows(columnar) {
+    const rows = [];
+    for (let d = 0; d < columnar.days; d++) {
+        const row = {};
+        columnar.scalar_fields.forEach(field => {
+            row[field] = columnar.columns[field][d];
+        });
+        columnar.tank_ids.forEach((tankId, t) => {
+            columnar.tank_fields.forEach(field => {
+                const value = columnar.tanks[field][d][t];
+                row[`tank${tankId}_${field}`] = field === 'status' ? columnar.status_values[value] : value;
+            });
+        });
+        rows.push(row);
+    }
+    return rows;
+}
+
 // ===== MOVED FROM HTML =====
 // Navigation functions
 function scrollToTop() {
@@ -443,20 +467,30 @@ async function runSimulation() {
         Utils.showLoading(true);
 
         const params = collectFormData();
+        const streaming = Boolean(window.ReadableStream && window.TextDecoder);
 
-        const response = await fetch(API_ENDPOINTS.SIMULATE, {
+        const response = await fetch(streaming ? API_ENDPOINTS.SIMULATE_STREAM : API_ENDPOINTS.SIMULATE, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify(params)
+            body: JSON.stringify(streaming ? params : { ...params, resultFormat: 'columnar' })
         });
 
         if (!response.ok) {
             throw new Error('Simulation request failed');
         }
 
-        currentResults = await response.json();
+        if (streaming) {
+            startProgressiveReport();
+            currentResults = await readSimulationStream(response, appendDailyReportRows);
+        } else {
+            currentResults = await response.json();
+        }
+
+        if (currentResults.simulation_data && currentResults.simulation_data.format === 'columnar') {
+            currentResults.simulation_data = columnarToRows(currentResults.simulation_data);
+        }
 
         if (currentResults.error) {
             alert('Simulation Error: ' + currentResults.error);
@@ -482,10 +516,134 @@ async function runSimulation() {
         console.error('Simulation error:', error);
         alert('Simulation failed: ' + error.message);
     } finally {
+        setLoadingProgress(null);
         Utils.showLoading(false);
     }
 }
 
+/**
+ * Read the NDJSON simulation stream, handing each batch of day records to onDays,
+ * and assemble the same result shape /api/simulate returns. A cached run arrives as
+ * a single summary record with no day records before it
+ */
+async function readSimulationStream(response, onDays) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const streamed = {
+        simulation_data: [],
+        alerts: [],
+        feeding_events_log: [],
+        filling_events_log: [],
+        daily_discharge_log: []
+    };
+    let summary = null;
+    let buffered = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+
+        const days = [];
+        lines.forEach(line => {
+            if (!line.trim()) return;
+            const record = JSON.parse(line);
+            if (record.type === 'day') {
+                streamed.simulation_data.push(record.day);
+                streamed.alerts.push(...record.alerts);
+                streamed.feeding_events_log.push(...record.feeding_events);
+                streamed.filling_events_log.push(...record.filling_events);
+                streamed.daily_discharge_log.push(...record.discharges);
+                days.push(record);
+            } else {
+                summary = record;
+            }
+        });
+        if (days.length > 0) onDays(days);
+        if (done) break;
+    }
+
+    if (!summary) throw new Error('Simulation stream ended early');
+    if (summary.type === 'error') return { error: summary.error };
+    delete summary.type;
+    // The summary's aggregated alerts, or a cached run's full lists, replace what was streamed
+    return { ...streamed, ...summary };
+}
+
+function setLoadingProgress(progress) {
+    const label = document.querySelector('#loading p');
+    if (label) {
+        label.textContent = progress === null ? 'Running simulation...' : `Running simulation... ${Math.round(progress * 100)}%`;
+    }
+}
+
+/**
+ * Show the results area with an empty daily report that fills in as days arrive
+ */
+function startProgressiveReport() {
+    const container = document.getElementById('dailyReportContainer');
+    if (container) container.innerHTML = dailyReportTableHTML('');
+    ['alertsContainer', 'metricsContainer'].forEach(id => {
+        const element = document.getElementById(id);
+        if (element) element.innerHTML = '';
+    });
+    Utils.showResults();
+    showTab('simulation', document.querySelector('.tab'));
+}
+
+function appendDailyReportRows(dayRecords) {
+    const body = document.querySelector('#dailyReportContainer tbody');
+    if (body) body.insertAdjacentHTML('beforeend', dayRecords.map(record => dailyReportRowHTML(record.day)).join(''));
+    setLoadingProgress(dayRecords[dayRecords.length - 1].progress);
+}
+
+/**
+ * FORECAST PREVIEW - quick aggregate projection refreshed while inputs change
+ */
+let forecastTimeout = null;
+
+function scheduleForecastPreview() {
+    clearTimeout(forecastTimeout);
+    forecastTimeout = setTimeout(updateForecastPreview, 300);
+}
+
+async function updateForecastPreview() {
+    const container = document.getElementById('forecastPreview');
+    if (!container) return;
+
+    try {
+        const response = await fetch(API_ENDPOINTS.FORECAST, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(collectFormData())
+        });
+        const forecast = await response.json();
+
+        if (!response.ok || forecast.error) {
+            showForecastError(container, forecast.error || `HTTP ${response.status}`);
+            return;
+        }
+
+        const belowDay = forecast.first_day_below_minimum;
+        const type = belowDay ? ALERT_TYPES.WARNING : ALERT_TYPES.INFO;
+        const message = `<strong>Preview:</strong> lowest projected inventory ${Utils.formatNumber(forecast.lowest_inventory)} bbl` +
+            (belowDay ? `, below minimum from day ${belowDay}` : ', stays above minimum') +
+            ` (${forecast.cargo_count} cargoes planned). <small>${forecast.accuracy_note}</small>`;
+        container.innerHTML = Utils.createAlert(type, message);
+    } catch (error) {
+        showForecastError(container, error.message);
+    }
+}
+
+function showForecastError(container, message) {
+    container.innerHTML = Utils.createAlert(ALERT_TYPES.DANGER, '<strong>Preview unavailable:</strong> <span></span>');
+    // The message can echo form input, so it goes in as text
+    container.querySelector('span').textContent = message;
+}
+
 /**
  * DISPLAY RESULTS
  */
@@ -571,7 +729,11 @@ function displayDailyReport(results) {
         return;
     }
 
-    let tableHTML = `
+    container.innerHTML = dailyReportTableHTML(results.simulation_data.map(dailyReportRowHTML).join(''));
+}
+
+function dailyReportTableHTML(rowsHTML) {
+    return `
         <h3>📊 Daily Operations Report</h3>
         <table class="schedule-table">
             <thead>
@@ -585,14 +747,14 @@ function displayDailyReport(results) {
                     <th>Cargo Arrival</th>
                 </tr>
             </thead>
-            <tbody>
-    `;
+            <tbody>${rowsHTML}</tbody></table>`;
+}
 
-    results.simulation_data.forEach((dayData) => {
-        const cargoInfo = dayData.cargo_type ? `${dayData.cargo_type} (${Utils.formatNumber(dayData.arrivals)})` : '-';
-        const tankUtilization = dayData.tank_utilization ? dayData.tank_utilization.toFixed(1) + '%' : 'N/A';
-        
-        tableHTML += `
+function dailyReportRowHTML(dayData) {
+    const cargoInfo = dayData.cargo_type ? `${dayData.cargo_type} (${Utils.formatNumber(dayData.arrivals)})` : '-';
+    const tankUtilization = dayData.tank_utilization ? dayData.tank_utilization.toFixed(1) + '%' : 'N/A';
+
+    return `
             <tr>
                 <td><strong>${dayData.day}</strong></td>
                 <td>${dayData.date}</td>
@@ -603,10 +765,6 @@ function displayDailyReport(results) {
                 <td>${cargoInfo}</td>
             </tr>
         `;
-    });
-
-    tableHTML += '</tbody></table>';
-    container.innerHTML = tableHTML;
 }
 
 /**
@@ -1329,7 +1487,12 @@ document.addEventListener('DOMContentLoaded', () => {
         setTimeout(() => {
             updateTankCount();
             initializeAutoSave();
+            updateForecastPreview();
         }, 500);
+
+        // Refresh the forecast preview as inputs change, including tanks added later
+        document.addEventListener('input', scheduleForecastPreview);
+        document.addEventListener('change', scheduleForecastPreview);
         
         console.log('Application initialized successfully');
     } catch (error) {
@@ -1347,6 +1510,7 @@ window.applyDefaultDeadBottom = applyDefaultDeadBottom;
 window.autoSaveInputs = autoSaveInputs;
 window.autoLoadInputs = autoLoadInputs;
 window.runSimulation = runSimulation;
+window.updateForecastPreview = updateForecastPreview;
 window.calculateBuffer = calculateBuffer;
 window.optimizeTanks = optimizeTanks;
 window.showTankStatus = showTankStatus;
@@ -10,7 +10,7 @@ import os
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import AdvancedRefineryCrudeScheduler
+from utils import AdvancedRefineryCrudeScheduler
 
 def test_processing_logic():
     """Test the processing logic with the scenario described by the user"""
@@ -0,0 +1,134 @@
+"""
+Regression tests for the Flask API routes
+"""
+
+import io
+import json
+import os
+import sys
+
+import openpyxl
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import routes
+from app import app
+from test_scheduler import make_params
+
+
+def client():
+    return app.test_client()
+
+
+def test_spilled_run_pages_over_http():
+    """Pages come back by offset/limit; bad paging params are a 400, unknown runs a 404"""
+    http = client()
+    summary = http.post('/api/simulate/long', json=make_params(schedulingWindow=20)).get_json()
+    run_id = summary['run_id']
+
+    page = http.get(f'/api/runs/{run_id}/days?offset=5&limit=10').get_json()
+    assert page['offset'] == 5 and page['total_days'] == 20
+    assert [row['day_index'] for row in page['simulation_data']] == list(range(6, 16))
+
+    assert http.get(f'/api/runs/{run_id}/days?offset=abc').status_code == 400
+    assert http.get(f'/api/runs/{run_id}/days?limit=1.5').status_code == 400
+    assert http.get('/api/runs/missing/days').status_code == 404
+    http.delete(f'/api/runs/{run_id}')
+    assert http.get(f'/api/runs/{run_id}/days').status_code == 404
+
+
+def test_stream_summary_keeps_request_params():
+    """The NDJSON stream ends with a summary whose parameters still hold maxInventory"""
+    routes.result_cache.clear()
+    response = client().post('/api/simulate/stream', json=make_params(schedulingWindow=20, maxInventory=9000000))
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record['type'] for record in records] == ['day'] * 20 + ['summary']
+    assert records[-1]['parameters']['maxInventory'] == 9000000
+    assert records[-1]['parameters']['processingRate'] == 200000
+
+
+def test_simulate_cache_serves_repeats_and_keeps_max_inventory():
+    """Repeats hit the result cache; maxInventory reaches the response and the chart export"""
+    routes.result_cache.clear()
+    http = client()
+    params = make_params(schedulingWindow=20, maxInventory=9000000)
+    first = http.post('/api/simulate', json=params)
+    hits = routes.result_cache.hits
+    repeat = http.post('/api/simulate', json=dict(params, processingRate='200000'))
+    assert routes.result_cache.hits == hits + 1
+    assert repeat.get_data() == first.get_data()
+    results = first.get_json()
+    assert results['parameters']['maxInventory'] == 9000000
+
+    other = http.post('/api/simulate', json=dict(params, maxInventory=8000000)).get_json()
+    assert other['parameters']['maxInventory'] == 8000000
+
+    stats = http.get('/api/simulate/cache').get_json()
+    assert stats['entries'] == 2 and stats['hits'] == routes.result_cache.hits
+
+    workbook = openpyxl.load_workbook(io.BytesIO(http.post('/api/export_charts', json=results).get_data()))
+    summary_rows = list(workbook['Summary Analysis'].iter_rows(values_only=True))
+    assert ('Maximum Inventory Threshold:', '9,000,000 bbl') in [row[:2] for row in summary_rows]
+    assert next(workbook['Inventory Chart'].iter_rows(min_row=2, max_row=2, values_only=True))[3] == 9000000
+
+
+def test_stream_progress_rises_to_one():
+    """Each streamed day reports its share of the window; a bad request streams one error record"""
+    routes.result_cache.clear()
+    http = client()
+    response = http.post('/api/simulate/stream', json=make_params(schedulingWindow=12))
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    progress = [record['progress'] for record in records if record['type'] == 'day']
+    assert progress == [day / 12 for day in range(1, 13)]
+    assert progress[-1] == 1.0 and 'progress' not in records[-1]
+
+    error = http.post('/api/simulate/stream', json=make_params(numTanks='many')).get_data(as_text=True)
+    assert [json.loads(line)['type'] for line in error.splitlines()] == ['error']
+
+
+def test_stream_summary_aggregates_alerts_like_simulate():
+    """The stream's summary alerts match /api/simulate's; aggregateAlerts=false keeps them raw"""
+    routes.result_cache.clear()
+    http = client()
+    params = make_params(schedulingWindow=20, numTanks=3)
+    streamed = [json.loads(line) for line in http.post('/api/simulate/stream', json=params).get_data(as_text=True).splitlines()]
+    summary = streamed[-1]
+    assert 'simulation_data' not in summary and 'feeding_events_log' not in summary
+
+    routes.result_cache.clear()
+    assert summary['alerts'] == http.post('/api/simulate', json=params).get_json()['alerts']
+    assert any(alert.get('count', 1) > 1 for alert in summary['alerts'])
+
+    routes.result_cache.clear()
+    raw = dict(params, aggregateAlerts=False)
+    streamed = [json.loads(line) for line in http.post('/api/simulate/stream', json=raw).get_data(as_text=True).splitlines()]
+    day_alerts = [alert for record in streamed[:-1] for alert in record['alerts']]
+    assert len(streamed[-1]['alerts']) == len(day_alerts) > len(summary['alerts'])
+
+
+def test_stream_shares_the_result_cache_with_simulate():
+    """A streamed run fills the cache; repeats, streamed or not, come back as the cached result"""
+    routes.result_cache.clear()
+    http = client()
+    params = make_params(schedulingWindow=20)
+    hits = routes.result_cache.hits
+    first = [json.loads(line) for line in http.post('/api/simulate/stream', json=params).get_data(as_text=True).splitlines()]
+    assert len(first) == 21 and routes.result_cache.hits == hits
+
+    repeat = [json.loads(line) for line in http.post('/api/simulate/stream', json=params).get_data(as_text=True).splitlines()]
+    assert routes.result_cache.hits == hits + 1
+    assert [record['type'] for record in repeat] == ['summary']
+    assert repeat[0]['simulation_data'] == [record['day'] for record in first[:-1]]
+    assert repeat[0]['alerts'] == first[-1]['alerts']
+
+    assert http.post('/api/simulate', json=params).get_json()['simulation_data'] == repeat[0]['simulation_data']
+    assert routes.result_cache.hits == hits + 2
+
+
+def test_invalid_flags_and_counts_are_rejected():
+    """Unparseable aggregateAlerts or a fractional numTanks never runs a simulation"""
+    http = client()
+    assert http.post('/api/simulate/long', json=make_params(numTanks=12.7)).status_code == 400
+    result = http.post('/api/simulate', json=make_params(aggregateAlerts='maybe')).get_json()
+    assert 'aggregateAlerts' in result['error']
@@ -0,0 +1,600 @@
+"""
+Regression tests for AdvancedRefineryCrudeScheduler
+"""
+
+import copy
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import ALERT_SEVERITY, PIPELINE_STAGES, REPEATABLE_ALERTS, AdvancedRefineryCrudeScheduler, Alert, BerthPool, ReadyTankQueue, ResultCache, SimulationConfig, StageCache, Tank, TankStatusSet, aggregate_alerts, columnar_to_rows, ensure_row_format, populate_tank_times, rows_to_columnar
+
+
+def make_params(**overrides):
+    """The test_fixes.py scenario with a fixed start date, plus overrides"""
+    params = {
+        'processingRate': 200000,
+        'tankCapacity': 600000,
+        'pumpingRate': 30000,
+        'departureMode': 'solver',
+        'preJourneyDays': 1,
+        'journeyDays': 10,
+        'preDischargeDays': 1,
+        'settlingTime': 2,
+        'labTestingDays': 1,
+        'bufferDays': 2,
+        'schedulingWindow': 45,
+        'disruptionDuration': 0,
+        'disruptionStart': 20,
+        'vlccCapacity': 2000000,
+        'suezmaxCapacity': 1000000,
+        'aframaxCapacity': 750000,
+        'panamaxCapacity': 0,
+        'handymaxCapacity': 0,
+        'bufferVolume': 500,
+        'minInventory': 2000000,
+        'crudeProcessingDate': '2025-03-01 13:30',
+    }
+    for i in range(1, 13):
+        params[f'tank{i}Level'] = 600000
+        params[f'deadBottom{i}'] = 10000
+    params.update(overrides)
+    return params
+
+
+def run(params, **kwargs):
+    return AdvancedRefineryCrudeScheduler().run_simulation(params, **kwargs)
+
+
+def test_time_series_midnights_match_daily_rows():
+    """Fractional settling and lab days change status in the next day's pass, as the rows do"""
+    for overrides in ({}, {'labTestingDays': 0.5}, {'settlingTime': 0.25, 'labTestingDays': 0.3}):
+        results = run(make_params(timelineSampleMinutes=60, **overrides))
+        series = results['time_series']
+        per_day = 24
+        for day, row in enumerate(results['simulation_data'], 1):
+            sample = day * per_day
+            assert np.isclose(series['inventory'][sample], row['end_inventory'], atol=1e-3), (overrides, day)
+            for col, tank_id in enumerate(series['tank_ids']):
+                status = series['status_values'][series['status'][sample][col]]
+                assert status == row[f'tank{tank_id}_status'], (overrides, day, tank_id)
+                assert np.isclose(series['levels'][sample][col], row[f'tank{tank_id}_level'], atol=1e-3)
+
+
+def test_forecast_follows_the_planned_schedule():
+    """The preview spans the window, keeps the hard stop and claims no fixed accuracy"""
+    params = make_params()
+    forecast = AdvancedRefineryCrudeScheduler().forecast_inventory(params)
+    assert forecast['days'] == list(range(1, params['schedulingWindow'] + 1))
+    assert forecast['cargo_count'] > 0
+    assert min(forecast['inventory']) >= min(params['minInventory'], forecast['initial_inventory']) - 1e-6
+    assert '72 scenarios' in forecast['accuracy_note']
+
+
+def test_forecast_tracks_the_simulation_until_the_hard_stop():
+    """Tank-sized releases put the forecast's first day below minimum on the simulated hard stop"""
+    params = make_params(processingRate=250000, numTanks=9, minInventory=3000000, pumpingRate=20000, schedulingWindow=20)
+    forecast = AdvancedRefineryCrudeScheduler().forecast_inventory(params)
+    days = run(params)['simulation_data']
+    cut = next(day['day_index'] for day in days[1:] if day['processing'] < params['processingRate'])
+    assert forecast['first_day_below_minimum'] == cut == 10
+    for day, inventory in zip(days[:cut], forecast['inventory']):
+        assert inventory == pytest.approx(day['end_inventory'], abs=1000)
+
+    params = make_params()
+    forecast = AdvancedRefineryCrudeScheduler().forecast_inventory(params)
+    assert forecast['first_day_below_minimum'] is None
+    farm = 12 * params['tankCapacity']
+    for day, inventory in zip(run(params)['simulation_data'], forecast['inventory']):
+        assert abs(inventory - day['end_inventory']) <= 0.17 * farm
+
+
+def test_disruption_study_matches_separate_runs():
+    """Each window resumed from the shared prefix summarizes like a run of its own"""
+    params = make_params(schedulingWindow=60)
+    windows = [(10, 5), (25, 3), (40, 10)]
+    study = AdvancedRefineryCrudeScheduler().study_disruptions(
+        dict(params, disruptionWindows=[{'start': start, 'duration': duration} for start, duration in windows]))
+
+    baseline = AdvancedRefineryCrudeScheduler()
+    baseline.run_simulation(params)
+    assert study['baseline'] == baseline._disruption_summary(None, baseline.simulation_data)
+    for window, summary in zip(windows, study['windows']):
+        separate = AdvancedRefineryCrudeScheduler()
+        separate.run_simulation(dict(params, disruptionStart=window[0], disruptionDuration=window[1]))
+        assert summary == separate._disruption_summary(window, separate.simulation_data, baseline.simulation_data)
+
+
+def test_demurrage_days_counts_vessel_days():
+    """Repeated DEMURRAGE alerts for one vessel on one day count once"""
+    scheduler = AdvancedRefineryCrudeScheduler()
+    scheduler.config = SimulationConfig.from_params({})
+    day_one, day_two = datetime(2025, 3, 1, 9), datetime(2025, 3, 2, 9)
+    scheduler.alerts = [
+        Alert('danger', 'DEMURRAGE', day_one, cargo_id=1, payload={'berth': 1, 'vessel': 'VLCC-V001'}),
+        Alert('danger', 'DEMURRAGE', day_one.replace(hour=15), cargo_id=1, payload={'berth': 1, 'vessel': 'VLCC-V001'}),
+        Alert('danger', 'DEMURRAGE', day_one, cargo_id=2, payload={'berth': 2, 'vessel': 'Suezmax-V002'}),
+        Alert('danger', 'DEMURRAGE', day_two, cargo_id=1, payload={'berth': 1, 'vessel': 'VLCC-V001'}),
+    ]
+    rows = [{'day': '01/03/25', 'end_inventory': 0, 'processing': 0}]
+    assert scheduler._disruption_summary(None, rows)['demurrage_days'] == 3
+
+
+def test_spilled_pages_match_the_full_run():
+    """Pages read back across page boundaries give the full run's days"""
+    params = make_params()
+    full = run(params)
+    scheduler = AdvancedRefineryCrudeScheduler()
+    summary = scheduler.run_spilled(params, page_days=7)
+    assert summary['days'] == params['schedulingWindow']
+    assert summary['metrics'] == full['metrics']
+
+    days = []
+    for offset in range(0, summary['days'], 10):
+        page = scheduler.spilled_page(summary['run_id'], offset, 10)
+        assert page['offset'] == offset and page['total_days'] == summary['days']
+        days.extend(page['simulation_data'])
+    assert days == full['simulation_data']
+    assert scheduler.spilled_page(summary['run_id'], 40, 100)['simulation_data'] == full['simulation_data'][40:]
+
+    scheduler.release_spilled_run(summary['run_id'])
+    with pytest.raises(KeyError):
+        scheduler.spilled_page(summary['run_id'])
+
+
+def test_config_round_trips_params():
+    """Inputs are normalized, unknown keys are carried through, equal params give equal configs"""
+    params = make_params(maxInventory=9000000, processingRate='200000')
+    config = SimulationConfig.from_params(params)
+    assert config.processing_rate == 200000.0 and config.num_tanks == 12
+    assert SimulationConfig.from_params(config.to_params()) == config
+    assert config.to_params()['maxInventory'] == 9000000
+    assert hash(config) == hash(SimulationConfig.from_params(dict(params)))
+    assert config.fingerprint() == SimulationConfig.from_params(dict(params, processingRate=200000)).fingerprint()
+    assert config.fingerprint() != SimulationConfig.from_params(dict(params, maxInventory=1)).fingerprint()
+
+    for key, value in (('processingRate', 'fast'), ('processingRate', 0), ('numBerths', 0), ('tank3Level', -5)):
+        with pytest.raises(ValueError):
+            SimulationConfig.from_params(dict(params, **{key: value}))
+    assert 'error' in run(dict(params, processingRate='fast'))
+
+
+
+def test_config_parses_flags_and_counts_strictly():
+    """'false' and '0' turn a flag off; non-integral counts are rejected, not truncated"""
+    for value, expected in ((False, False), ('false', False), ('0', False), (0, False),
+                            (True, True), ('True', True), ('1', True), (1, True)):
+        assert SimulationConfig.from_params({'aggregateAlerts': value}).aggregate_alerts is expected, value
+    assert SimulationConfig.from_params({'numTanks': '12', 'schedulingWindow': 30.0}).scheduling_window == 30
+    assert SimulationConfig.from_params({'checkpointDays': ['5', 10.0]}).checkpoint_days == (5, 10)
+
+    for key, value in (('aggregateAlerts', 'maybe'), ('aggregateAlerts', 2), ('numTanks', 12.7),
+                       ('numBerths', '2.5'), ('schedulingWindow', 'inf'), ('checkpointDays', [1.5])):
+        with pytest.raises(ValueError, match=key):
+            SimulationConfig.from_params({key: value})
+
+    raw = run(make_params(aggregateAlerts='false'))['alerts']
+    assert raw == run(make_params(aggregateAlerts=False))['alerts']
+    assert len(raw) > len(run(make_params())['alerts'])
+
+def test_summary_echoes_unknown_params():
+    """Parsed configs keep request keys the simulation does not read, like maxInventory"""
+    params = make_params(maxInventory=9000000)
+    assert run(SimulationConfig.from_params(params))['parameters']['maxInventory'] == 9000000
+    assert run(params)['parameters']['maxInventory'] == 9000000
+
+
+def test_result_cache_bounds():
+    """Entries are evicted least recently used first by count and bytes, and expire after the TTL"""
+    cache = ResultCache(max_entries=2, max_bytes=10, ttl_seconds=60)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    assert cache.get('a') == b'1234'
+    cache.put('c', b'12')
+    assert cache.get('b') is None and cache.get('a') == b'1234'
+    cache.put('d', b'123456')
+    assert cache.get('c') is None and cache.total_bytes == 10
+    cache.put('huge', b'x' * 11)
+    assert cache.get('huge') is None
+    assert (cache.hits, cache.misses) == (2, 3)
+
+    expired = ResultCache(ttl_seconds=0)
+    expired.put('a', b'1')
+    assert expired.get('a') is None and expired.stats()['bytes'] == 0
+
+
+def test_tank_state_object():
+    """Tanks are slotted, read like the old dicts and export every field but the event handles"""
+    tank = Tank(id=3, volume=400000, status='READY', capacity=600000, dead_bottom=10250, available=389750)
+    assert not hasattr(tank, '__dict__')
+    assert tank['volume'] == 400000 and tank.get('missing', 'x') == 'x'
+    with pytest.raises(KeyError):
+        tank['missing']
+    tank.open_feeding_event = {'tank_id': 3, 'start': datetime(2025, 3, 1), 'end': None}
+    details = tank.to_dict()
+    assert 'open_feeding_event' not in details and details['available'] == 389750
+
+    clone = copy.deepcopy([tank, tank.open_feeding_event])
+    assert clone[0].open_feeding_event is clone[1] and clone[1] is not tank.open_feeding_event
+
+    results = run(make_params())
+    assert len(results['full_tank_details']) == 12
+    assert set(results['full_tank_details'][0]) == set(details)
+
+
+def many_tank_params(**overrides):
+    """40 tanks at mixed levels, enough demand to cycle most of them"""
+    params = make_params(numTanks=40, processingRate=900000, schedulingWindow=60, **overrides)
+    for i in range(1, 41):
+        params[f'tank{i}Level'] = [600000, 300000, 10000, 450000][i % 4]
+        params[f'deadBottom{i}'] = 10000
+    return params
+
+
+def test_tank_levels_balance_each_day():
+    """With 40 tanks looked up by id, the tank farm changes by each day's fills less its processing"""
+    params = many_tank_params()
+    results = run(params)
+    discharged = {}
+    for entry in results['daily_discharge_log']:
+        discharged[entry['date']] = discharged.get(entry['date'], 0) + entry['volume_filled']
+    total = sum(params[f'tank{i}Level'] for i in range(1, 41))
+    for row in results['simulation_data']:
+        expected = total + discharged.get(row['date'], 0) - row['processing']
+        total = sum(row[f'tank{i}_level'] for i in range(1, 41))
+        assert abs(total - expected) < 0.01, row['day']
+    assert {tank['id'] for tank in results['full_tank_details']} == set(range(1, 41))
+
+
+def test_running_inventory_total_never_drifts(monkeypatch):
+    """DEBUG runs recompute the available total from the tanks at every day boundary"""
+    monkeypatch.setenv('DEBUG', 'true')
+    for params in (make_params(), many_tank_params(), make_params(labTestingDays=0.5, schedulingWindow=60)):
+        scheduler = AdvancedRefineryCrudeScheduler()
+        results = scheduler.run_simulation(params)
+        assert 'error' not in results
+        assert abs(scheduler.available_inventory - sum(tank['available'] for tank in results['full_tank_details'])) < 1e-6
+        assert results['simulation_data'][-1]['end_inventory'] == scheduler.available_inventory
+
+
+def test_ready_queue_picks_like_a_full_scan():
+    """pop_next() returns what sorting every eligible READY tank by filled time would"""
+    rng = random.Random(5)
+    for _ in range(50):
+        tanks = []
+        for i in range(1, 16):
+            tank = Tank(id=i, volume=500000, status='READY', capacity=600000,
+                        available=rng.choice([0, 250000, 490000]), can_feed_from_day=rng.randint(1, 6))
+            tank.filled_datetime = rng.choice([None, datetime(2025, 3, 1) + timedelta(hours=rng.randint(0, 96))])
+            tanks.append(tank)
+        queue = ReadyTankQueue()
+        for tank in tanks:
+            queue.add(tank)
+        for day in range(1, 10):
+            eligible = [t for t in tanks if t.status == 'READY' and t.available > 0 and day >= t.can_feed_from_day]
+            expected = min(eligible, key=lambda t: (t.filled_datetime or datetime.min, t.id), default=None)
+            picked = queue.pop_next(day)
+            assert picked is expected
+            if picked is not None:
+                picked.status = 'FEEDING'
+
+
+def test_status_set_finds_lowest_id_like_a_full_scan():
+    """first() matches a scan in id order while tanks enter and leave the status"""
+    rng = random.Random(6)
+    tanks = [Tank(id=i, volume=10000, status='READY', capacity=600000) for i in range(1, 21)]
+    empty = TankStatusSet('EMPTY')
+    for _ in range(500):
+        tank = rng.choice(tanks)
+        if rng.random() < 0.5:
+            tank.status = 'EMPTY'
+            empty.add(tank)
+        else:
+            tank.status = rng.choice(['FILLING', 'READY'])
+        tank.fed_today = rng.random() < 0.3
+        expected = next((t for t in tanks if t.status == 'EMPTY' and not t.fed_today), None)
+        assert empty.first(lambda t: not t.fed_today) is expected
+
+
+def test_arrival_index_matches_a_schedule_scan():
+    """Indexed arrivals for each date are the scheduled cargoes of that date, in schedule order"""
+    scheduler = AdvancedRefineryCrudeScheduler()
+    scheduler.run_simulation(make_params(schedulingWindow=60))
+    schedule = scheduler.cargo_schedule
+    arrivals_by_date = scheduler._index_cargo_arrivals(schedule)
+    first = min(cargo['arrival_datetime'] for cargo in schedule)
+    for offset in range(-2, 70):
+        day = first + timedelta(days=offset)
+        expected = [cargo['cargo_id'] for cargo in schedule if cargo['arrival_datetime'].date() == day.date()]
+        found = scheduler._check_cargo_arrival(day, schedule, arrivals_by_date)
+        assert [arrival['cargo_id'] for arrival in found or []] == expected
+        assert (found is None) == (not expected)
+        assert scheduler._check_cargo_arrival(day.date(), schedule) == found
+
+
+def test_cargo_ledger_tracks_each_cargo_once():
+    """Status updates land on the cargo's one ledger entry, in order of first tracking"""
+    scheduler = AdvancedRefineryCrudeScheduler()
+    scheduler.track_cargo_status(7, 'ARRIVED', 2, {'vessel_name': 'VLCC-V007', 'size': 2000000})
+    scheduler.track_cargo_status(3, 'ARRIVED', 1)
+    scheduler.track_cargo_status(7, 'COMPLETED', cargo_info={'actual_departure': datetime(2025, 3, 9)})
+    assert [event['cargo_id'] for event in scheduler.actual_cargo_events] == [7, 3]
+    event = scheduler.get_cargo_event(7)
+    assert (event['status'], event['berth_id'], event['size']) == ('COMPLETED', 2, 2000000)
+    assert event['actual_departure'] == datetime(2025, 3, 9)
+    assert scheduler.get_cargo_event(3)['vessel_name'] == 'Cargo-003'
+    assert scheduler.get_cargo_event(99) is None
+
+    scheduler.actual_cargo_events = [{'cargo_id': 1, 'status': 'PUMPING'}]
+    assert scheduler.get_cargo_event(1)['status'] == 'PUMPING' and scheduler.get_cargo_event(7) is None
+
+    results = run(make_params())
+    for cargo in results['cargo_report']:
+        assert cargo['status'] in ('Scheduled', 'Arrived', 'Pumping', 'Completed')
+    assert any(cargo['status'] == 'Completed' for cargo in results['cargo_report'])
+
+
+def test_event_logs_close_through_open_handles():
+    """Feeding entries close in order per tank, only a still-feeding tank keeps one open, closed fills are ordered"""
+    results = run(many_tank_params())
+    statuses = {tank['id']: tank['status'] for tank in results['full_tank_details']}
+
+    by_tank = {}
+    for event in results['feeding_events_log']:
+        by_tank.setdefault(event['tank_id'], []).append(event)
+    for tank_id, events in by_tank.items():
+        events.sort(key=lambda event: event['start'])
+        for event, following in zip(events, events[1:]):
+            assert event['end'] is not None and event['start'] <= event['end'] <= following['start']
+        if events[-1]['end'] is None:
+            assert statuses[tank_id] == 'FEEDING'
+
+    closed = [event for event in results['filling_events_log'] if event['ready_time'] is not None]
+    assert closed
+    for event in closed:
+        assert event['start'] <= event['end'] <= event['settle_start'] <= event['lab_start'] <= event['ready_time']
+
+
+def test_alerts_are_records_filtered_by_level():
+    """Raw alerts render to the same dicts, and alertLevel drops everything less severe"""
+    params = make_params(aggregateAlerts=False)
+    rendered = run(params)['alerts']
+    raw = run(params, render_alerts=False)['alerts']
+    assert all(isinstance(alert, Alert) for alert in raw)
+    assert [alert.to_dict() for alert in raw] == rendered
+    assert all(set(alert) == {'type', 'day', 'message'} for alert in rendered)
+
+    for level in ('success', 'warning', 'danger'):
+        kept = run(dict(params, alertLevel=level), render_alerts=False)['alerts']
+        expected = [alert for alert in raw if ALERT_SEVERITY[alert.type] >= ALERT_SEVERITY[level]]
+        assert [alert.to_dict() for alert in kept] == [alert.to_dict() for alert in expected]
+
+
+def test_repeated_alerts_merge_into_runs():
+    """Repeats on the same or next day merge; a gap or another key starts a new record"""
+    def alert(day, cargo_id=1):
+        return Alert('danger', 'DEMURRAGE', datetime(2025, 3, day, 10), cargo_id=cargo_id,
+                     payload={'berth': 1, 'vessel': f'V{cargo_id}'})
+    alerts = [alert(1), alert(2), alert(2, cargo_id=2), alert(3), alert(6)]
+    assert REPEATABLE_ALERTS['DEMURRAGE'] == ('cargo_id',)
+    merged = aggregate_alerts(alerts)
+    assert [(a.cargo_id, a.timestamp.day, a.count) for a in merged] == [(1, 1, 3), (2, 2, 1), (1, 6, 1)]
+    assert merged[0].last_timestamp == datetime(2025, 3, 3, 10)
+    assert merged[0].to_dict()['last_day'] == '03/03' and all(a.count == 1 for a in alerts)
+
+    params = make_params(schedulingWindow=60)
+    raw = run(dict(params, aggregateAlerts=False))['alerts']
+    grouped = run(params)['alerts']
+    assert sum(alert.get('count', 1) for alert in grouped) == len(raw)
+
+
+
+def test_waiting_vessels_aggregate_per_cargo():
+    """Two vessels waiting over the same days keep one record each"""
+    alerts = [Alert('warning', 'BERTH_WAITING', datetime(2025, 3, day, 8), cargo_id=cargo_id,
+                    payload={'vessel': f'VLCC-V00{cargo_id}'})
+              for day in (4, 5) for cargo_id in (1, 2)]
+    merged = aggregate_alerts(alerts)
+    assert [(alert.cargo_id, alert.count) for alert in merged] == [(1, 2), (2, 2)]
+    assert 'VLCC-V001' in merged[0].message and 'VLCC-V002' in merged[1].message
+
+    raw = run(make_params(numBerths=1, schedulingWindow=60, aggregateAlerts=False), render_alerts=False)['alerts']
+    grouped = run(make_params(numBerths=1, schedulingWindow=60), render_alerts=False)['alerts']
+    waiting = {alert.cargo_id for alert in raw if alert.code == 'BERTH_WAITING'}
+    grouped_waiting = [alert for alert in grouped if alert.code == 'BERTH_WAITING']
+    assert len(waiting) > 1
+    assert {alert.cargo_id for alert in grouped_waiting} == waiting
+    assert all(alert.payload['vessel'] in alert.message for alert in grouped_waiting)
+
+def test_columnar_results_round_trip_to_rows():
+    """A columnar run is the row run with simulation_data re-encoded, and converts back exactly"""
+    rows_result = run(make_params())
+    columnar_result = run(make_params(resultFormat='columnar'))
+    columnar = columnar_result['simulation_data']
+    assert columnar['days'] == len(rows_result['simulation_data'])
+    assert np.asarray(columnar['tanks']['level']).shape == (columnar['days'], 12)
+    assert columnar == rows_to_columnar(rows_result['simulation_data'])
+    assert columnar_to_rows(columnar) == rows_result['simulation_data']
+    assert [list(row) for row in columnar_to_rows(columnar)] == [list(row) for row in rows_result['simulation_data']]
+
+    restored = ensure_row_format(columnar_result)
+    for key in rows_result:
+        if key != 'parameters':
+            assert restored[key] == rows_result[key], key
+    assert ensure_row_format(rows_result) is rows_result
+
+
+def test_tank_times_take_the_day_as_a_date():
+    """Passing current_date gives the same times as parsing day_data['date']"""
+    tank = Tank(id=1, volume=300000, status='SETTLING', capacity=600000, dead_bottom=10000, available=290000)
+    base = datetime(2025, 3, 4)
+    for offset, name in enumerate(('feeding_start', 'feeding_end', 'empty', 'filling_start', 'filling_end',
+                                   'filled', 'settling_start', 'settling_end', 'lab_testing_start',
+                                   'lab_testing_end', 'ready_start', 'suspended_start', 'suspended_end')):
+        setattr(tank, f'{name}_datetime', base + timedelta(hours=7 * offset + 1, minutes=15))
+
+    for status in ('FEEDING', 'EMPTY', 'FILLING', 'FILLED', 'SETTLING', 'LAB_TESTING', 'READY', 'SUSPENDED'):
+        for day in range(8):
+            current_date = (base + timedelta(days=day)).date()
+            day_data = {'date': current_date.strftime('%d/%m/%y')}
+            parsed = populate_tank_times(status, 1, day_data, [], [], tank)
+            assert populate_tank_times(status, 1, {}, [], [], tank, current_date) == parsed, (status, day)
+    assert populate_tank_times('FEEDING', 1, {}, [], [], tank) == ('', '')
+
+
+def test_resumed_runs_match_fresh_runs():
+    """Resuming from a checkpoint after an edit gives the results of a full run of the edit"""
+    params = make_params(schedulingWindow=60, checkpointInterval=5)
+    edits = [{'disruptionStart': 30, 'disruptionDuration': 4}, {'vlccCapacity': 1800000},
+             {'processingRate': 210000}, {'maxInventory': 9000000}]
+    for edit in edits:
+        scheduler = AdvancedRefineryCrudeScheduler()
+        scheduler.run_simulation(params)
+        edited = dict(params, **edit)
+        records = list(scheduler.iter_simulation(edited, resume=True))
+        replayed = sum(record['type'] == 'day' for record in records)
+        resumed = records[-1]
+        assert resumed.pop('type') == 'summary'
+        fresh = run(edited)
+        for key in fresh:
+            assert resumed[key] == fresh[key], (edit, key)
+        if 'processingRate' in edit:
+            assert replayed == 60
+        else:
+            assert replayed < 60, edit
+
+
+def test_streamed_days_add_up_to_the_full_run():
+    """Day records carry the full run's rows and raw alerts; retain=False keeps only the summary"""
+    params = make_params(aggregateAlerts=False)
+    full = run(params)
+    records = list(AdvancedRefineryCrudeScheduler().iter_simulation(params))
+    days = [record for record in records if record['type'] == 'day']
+    assert records[-1]['type'] == 'summary' and len(days) == len(records) - 1
+    assert [record['day'] for record in days] == full['simulation_data']
+    assert [alert for record in days for alert in record['alerts']] == full['alerts']
+    assert [entry for record in days for entry in record['discharges']] == full['daily_discharge_log']
+    for log in ('feeding', 'filling'):
+        streamed = [entry for record in days for entry in record[f'{log}_events']]
+        assert sorted(map(repr, streamed)) == sorted(map(repr, full[f'{log}_events_log']))
+
+    lean = list(AdvancedRefineryCrudeScheduler().iter_simulation(params, retain=False))
+    summary = lean[-1]
+    assert [record['day'] for record in lean[:-1]] == full['simulation_data']
+    for key in ('simulation_data', 'alerts', 'feeding_events_log', 'filling_events_log', 'daily_discharge_log'):
+        assert key not in summary
+    assert summary['metrics'] == full['metrics']
+    assert summary['cargo_report'] == full['cargo_report']
+
+
+def test_berth_pool_hands_out_the_lowest_free_berth():
+    """occupy/release keep lowest_free() on the lowest unoccupied id"""
+    pool = BerthPool(4)
+    assert len(pool) == 4 and pool.lowest_free() == 1
+    pool.occupy(1, 'VLCC-V001', 1)
+    pool.occupy(2, 'VLCC-V002', 2)
+    assert pool.lowest_free() == 3 and not pool.is_free(2) and not pool.is_free(5)
+    assert pool[2] == {'occupied': True, 'vessel': 'VLCC-V002', 'cargo_id': 2}
+    pool.release(2)
+    pool.release(2)
+    assert pool.lowest_free() == 2 and pool[2]['vessel'] is None
+    for berth_id in (2, 3, 4):
+        pool.occupy(berth_id, f'V{berth_id}', berth_id)
+    assert pool.lowest_free() is None
+    pool.release(3)
+    assert pool.lowest_free() == 3
+    assert BerthPool(0).lowest_free() is None
+
+
+def test_berth_count_is_a_parameter():
+    """Cargoes are planned and unloaded only at berths 1..numBerths"""
+    for num_berths in (1, 3, 6):
+        scheduler = AdvancedRefineryCrudeScheduler()
+        results = scheduler.run_simulation(make_params(numBerths=num_berths, schedulingWindow=60))
+        berths = {f'BERTH {berth_id}' for berth_id in range(1, num_berths + 1)}
+        assert {cargo['berth'] for cargo in results['cargo_report']} <= berths
+        assert {cargo['planned_berth'] for cargo in scheduler.cargo_schedule} == set(range(1, num_berths + 1))
+
+
+def test_generated_schedule_keeps_berths_consistent():
+    """Arrivals come in cargo order and never overlap a berth's previous vessel"""
+    scenarios = [{}, {'numBerths': 3}, {'journeyDays': 5, 'schedulingWindow': 90},
+                 {'vlccCapacity': 0, 'suezmaxCapacity': 0, 'processingRate': 300000}]
+    for overrides in scenarios:
+        params = make_params(**overrides)
+        scheduler = AdvancedRefineryCrudeScheduler()
+        results = scheduler.run_simulation(params)
+        schedule = scheduler.cargo_schedule
+        assert schedule and 'error' not in results, overrides
+        assert [cargo['cargo_id'] for cargo in schedule] == list(range(1, len(schedule) + 1))
+        arrivals = [cargo['arrival_datetime'] for cargo in schedule]
+        assert arrivals == sorted(arrivals), overrides
+        free_at = {}
+        for cargo in schedule:
+            berth = cargo['planned_berth']
+            assert 1 <= berth <= params.get('numBerths', 2)
+            assert cargo['departure_datetime'] < cargo['arrival_datetime'] < cargo['dep_back_datetime']
+            assert cargo['arrival_datetime'] >= free_at.get(berth, cargo['arrival_datetime']), (overrides, cargo['cargo_id'])
+            free_at[berth] = cargo['dep_back_datetime']
+
+
+def test_stage_cache_evicts_least_recently_used():
+    """A hit refreshes an entry, so the entry evicted is the one unused for longest"""
+    cache = StageCache(2)
+    assert cache.lookup('a', lambda: 1) == 1 and cache.lookup('b', lambda: 2) == 2
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_memoized_stages_match_fresh_runs():
+    """Edits rerun only the stages that read them, and results equal a fresh run"""
+    scheduler = AdvancedRefineryCrudeScheduler()
+    caches = scheduler.stage_caches
+
+    def hits():
+        return {name: cache.hits for name, cache in caches.items()}
+
+    edits = [
+        ({}, set()),
+        ({'bufferDays': 4}, {'cargo_schedule', 'day_loop', 'metrics', 'cargo_report'}),
+        ({'deadBottom3': 20000}, {'buffer_stock'}),
+        ({'bufferDays': 4}, set(PIPELINE_STAGES)),
+    ]
+    for edit, expected_hits in edits:
+        params = make_params(**edit)
+        before = hits()
+        memoized = scheduler.run_simulation(params)
+        after = hits()
+        assert {name for name in caches if after[name] > before[name]} == expected_hits, edit
+        fresh = run(params)
+        for key in fresh:
+            assert memoized[key] == fresh[key], (edit, key)
+
+
+def test_memoized_results_survive_caller_mutation():
+    """Mutating a returned result or the scheduler's state never reaches the stage caches"""
+    params = make_params()
+    fresh = run(params)
+    scheduler = AdvancedRefineryCrudeScheduler()
+    for _ in range(3):
+        results = scheduler.run_simulation(params)
+        for key in fresh:
+            assert results[key] == fresh[key], key
+        results['simulation_data'][0]['end_inventory'] = -1
+        results['simulation_data'].clear()
+        results['alerts'].clear()
+        results['metrics'].clear()
+        results['cargo_report'][0]['size'] = 0
+        results['buffer_info'].clear()
+        scheduler.cargo_schedule.clear()
+        scheduler.full_tank_details.clear()
+        scheduler.cargo_ledger.clear()
+    assert scheduler.stage_caches['day_loop'].hits == 2